@@ -1,22 +1,76 @@
 import os
+import queue
 import threading
+from collections import deque
 import pygame
 import chess
+import chess.polyglot
 from stockfish import Stockfish
 
-# Define a custom event for the AI move
-AI_MOVE_EVENT = pygame.USEREVENT + 1
+# Custom events posted by the engine worker thread
+EVAL_READY_EVENT = pygame.USEREVENT + 2
+AI_READY_EVENT = pygame.USEREVENT + 3
+
+class RawUciStockfish(Stockfish):
+    """
+    Stockfish wrapper that runs a search with plain "position"/"go" commands and reads back
+    both the best move and the score from that one search. Commands are written straight to
+    the engine's stdin, because the library's _put() waits for "isready" before each command
+    in newer versions.
+    """
+
+    def _send(self, command: str):
+        """Write a UCI command to the engine without waiting for any reply."""
+        self._stockfish.stdin.write(f"{command}\n")
+        self._stockfish.stdin.flush()
+
+    def submit_fen(self, fen: str, depth: int):
+        """Send the position and start a fixed-depth search. Does not wait for any reply."""
+        self._send(f"position fen {fen}")
+        self._send(f"go depth {depth}")
+
+    def read_result(self):
+        """
+        Block until the submitted search finishes.
+        Returns the best move (UCI string or None) and the principal line's score
+        as {"type": "cp"/"mate", "value": int} from the side to move's view, or None.
+        """
+        evaluation = None
+        while True:
+            parts = self._read_line().split()
+            if not parts:
+                continue
+            if parts[0] == "bestmove":
+                best_uci = parts[1] if len(parts) > 1 and parts[1] != "(none)" else None
+                return best_uci, evaluation
+            if parts[0] == "info" and "score" in parts:
+                # Low skill levels search several lines; only the first one is the engine's eval.
+                if "multipv" in parts and parts[parts.index("multipv") + 1] != "1":
+                    continue
+                i = parts.index("score")
+                evaluation = {"type": parts[i + 1], "value": int(parts[i + 2])}
+
+    def resync(self):
+        """Stop any running search and discard the engine's output up to "readyok"."""
+        self._send("stop")
+        self._send("isready")
+        while self._read_line() != "readyok":
+            pass
 
 class ChessGame:
     def __init__(self):
         # -------------------------------------------------------
         #     CONFIGURATION
         # -------------------------------------------------------
+        self.BOOK_PATH = "book.bin"  # Optional polyglot opening book.
         self.STOCKFISH_PATH = r"C:\Users\Admin\Downloads\stockfish-windows-x86-64-avx2\stockfish\stockfish-windows-x86-64-avx2.exe"
         self.WIDTH, self.HEIGHT = 800, 400
         self.BOARD_SIZE = 400
         self.BAR_WIDTH = 60
         self.SQUARE_SIZE = self.BOARD_SIZE // 8
+        self.EVAL_CACHE_SIZE = 100000  # Max positions kept in the evaluation cache.
+        self.EVAL_DEPTH = 8  # Search depth for the evaluation bar.
+        self.AI_DEPTH = 12   # Search depth for the AI's own moves.
 
         # Colors
         self.WHITE  = (255, 255, 255)
@@ -36,177 +90,374 @@ class ChessGame:
         self.font = pygame.font.SysFont("Arial", 20)
 
         # Preload piece images with error handling.
-        self.images = self.load_images()
+        self._images_flat = self.load_images()
+
+        # Pixel position and rect of every square (0-63), computed once.
+        self._sq_xy = tuple(
+            ((sq & 7) * self.SQUARE_SIZE, (7 - (sq >> 3)) * self.SQUARE_SIZE) for sq in range(64)
+        )
+        self._sq_rect = tuple(
+            pygame.Rect(x, y, self.SQUARE_SIZE, self.SQUARE_SIZE) for (x, y) in self._sq_xy
+        )
+
+        # Pre-render the static checkerboard once; it is blitted in a single call.
+        self._board_bg = self.render_board_background()
+
+        # Pre-render the square outlines used as highlights, one per color.
+        self._hl_surf = {}
+        for color in (self.YELLOW, self.ORANGE):
+            surf = pygame.Surface((self.SQUARE_SIZE, self.SQUARE_SIZE), pygame.SRCALPHA)
+            pygame.draw.rect(surf, color, surf.get_rect(), 3)
+            self._hl_surf[color] = surf.convert_alpha()
+
+        # The bar labels never change; finished bars are cached per displayed score.
+        self._white_label = self.font.render("White", True, self.WHITE)
+        self._black_label = self.font.render("Black", True, self.WHITE)
+        self._bar_cache: dict[float, pygame.Surface] = {}
+        self._game_over_surf: pygame.Surface | None = None  # Rendered when the game ends.
 
         # Initialize Stockfish engine with error handling.
         try:
-            self.stockfish = Stockfish(self.STOCKFISH_PATH)
+            self.stockfish = RawUciStockfish(self.STOCKFISH_PATH)
             self.stockfish.set_skill_level(5)  # Skill level from 0 to 20.
         except Exception as e:
             print("Error initializing Stockfish:", e)
             self.stockfish = None
 
+        # Open the opening book if there is one; book moves skip the engine search.
+        self._book = None
+        if os.path.exists(self.BOOK_PATH):
+            try:
+                self._book = chess.polyglot.open_reader(self.BOOK_PATH)
+            except Exception as e:
+                print("Error opening opening book:", e)
+
         # Game state variables.
         self.board = chess.Board()
         self.selected_square = None
         self.last_ai_move = None
         self.current_score = 0.0
-        self.ai_move_scheduled = False
+
+        # Display state: the board and evaluation bar are only redrawn when they
+        # change, and only the redrawn areas are pushed to the screen.
+        self._dirty: list[pygame.Rect] = []
+        self._needs_redraw = True
+        self._last_drawn_score = None
+        self._full_update = True  # Present the whole window, not just the dirty rects.
+        # Piece and highlight drawn on each non-empty square; None forces a full board redraw.
+        self._drawn_board: dict | None = None
+
+        # Legal moves, Zobrist hash and FEN of the current position, reused until the
+        # board changes. _board_generation is bumped on every push/pop/reset.
+        self._board_generation = 0
+        self._legal_cache = (-1, frozenset())
+        self._key_cache = (-1, 0)
+        self._fen_cache = (-1, "")
+
+        # Evaluation cache keyed by Zobrist hash, so revisited positions
+        # (undo, reset, repetitions) don't need another Stockfish search.
+        self._eval_cache: dict[int, float] = {}
+        self._eval_cache_keys = deque()
+
+        # Stockfish runs on a worker thread so the main loop never blocks on it.
+        # Jobs are (kind, fen, key, depth, generation) tuples, where key is the Zobrist
+        # hash and generation the _board_generation of the position they were requested for.
+        self._engine_jobs = queue.Queue()
+        if self.stockfish:
+            self._engine_thread = threading.Thread(target=self._engine_worker, daemon=True)
+            self._engine_thread.start()
 
     def load_images(self):
-        """Preload all piece images from the assets folder with error handling."""
-        images = {}
+        """
+        Preload all piece images from the assets folder with error handling.
+        Returns a flat list indexed by (color << 3) | piece_type.
+        """
+        images = [None] * 16
         asset_folder = "assets"
-        pieces = ['P', 'N', 'B', 'R', 'Q', 'K']
+        pieces = ['P', 'N', 'B', 'R', 'Q', 'K']  # In chess.PAWN..chess.KING order.
         # We'll use 'w' for white pieces and 'b' for black pieces.
-        for color_prefix in ['w', 'b']:
-            for piece in pieces:
+        for color, color_prefix in [(chess.WHITE, 'w'), (chess.BLACK, 'b')]:
+            for piece_type, piece in zip(chess.PIECE_TYPES, pieces):
                 key = color_prefix + piece
+                index = (color << 3) | piece_type
                 image_path = os.path.join(asset_folder, f"{key}.png")
                 try:
                     img = pygame.image.load(image_path)
                     img = pygame.transform.scale(img, (self.SQUARE_SIZE, self.SQUARE_SIZE))
-                    images[key] = img
+                    # Match the display's pixel format so blits take the fast path.
+                    img = img.convert_alpha()
+                    images[index] = img
                 except Exception as e:
                     print(f"Error loading image {image_path}: {e}")
                     # Create a dummy surface if the image is not found.
-                    dummy = pygame.Surface((self.SQUARE_SIZE, self.SQUARE_SIZE))
+                    dummy = pygame.Surface((self.SQUARE_SIZE, self.SQUARE_SIZE)).convert()
                     dummy.fill(self.GRAY)
-                    images[key] = dummy
+                    images[index] = dummy
         return images
 
+    def render_board_background(self):
+        """Draw the 64 alternating board squares onto a surface of their own."""
+        bg = pygame.Surface((self.BOARD_SIZE, self.BOARD_SIZE)).convert()
+        for row in range(8):
+            for col in range(8):
+                square_color = self.WHITE if (row + col) % 2 == 0 else self.GRAY
+                pygame.draw.rect(
+                    bg,
+                    square_color,
+                    (col * self.SQUARE_SIZE, row * self.SQUARE_SIZE,
+                     self.SQUARE_SIZE, self.SQUARE_SIZE)
+                )
+        return bg
+
     def get_piece_image(self, piece: chess.Piece):
         """Return the preloaded image for the given chess piece."""
-        color_prefix = "w" if piece.color else "b"
-        piece_type = piece.symbol().upper()  # 'P','N','B','R','Q','K'
-        key = color_prefix + piece_type
-        return self.images.get(key)
+        return self._images_flat[(piece.color << 3) | piece.piece_type]
 
-    def get_evaluation_score(self) -> float:
-        """Get the evaluation of the current board position (clamped between -5 and 5)."""
-        if self.stockfish:
+    def _engine_worker(self):
+        """
+        Run queued Stockfish jobs and post the results back to the main loop as events.
+        Every search reports a score, so a "bestmove" job also updates the evaluation.
+        """
+        while True:
+            job = self._engine_jobs.get()
+            if job is None:
+                break
+            kind, fen, key, depth, generation = job
+            # Skip a best-move search the board has already moved on from (undo, reset,
+            # another move); its result would be dropped anyway.
+            if kind == "bestmove" and generation != self._board_generation:
+                continue
+            best_uci, score = self.search_fen(fen, depth)
+            pygame.event.post(pygame.event.Event(EVAL_READY_EVENT, key=key, score=score))
+            if kind == "bestmove":
+                pygame.event.post(pygame.event.Event(AI_READY_EVENT, key=key, move=best_uci))
+
+    def search_fen(self, fen: str, depth: int):
+        """
+        Search the given position with Stockfish. Returns the best move (UCI string) and
+        the evaluation from White's view clamped between -5 and 5; either may be None on error.
+        """
+        try:
+            self.stockfish.submit_fen(fen, depth)
+            best_uci, evaluation = self.stockfish.read_result()
+        except Exception as e:
+            print("Error searching position:", e)
+            # Drop what is left of the failed search so the next job doesn't read it.
             try:
-                self.stockfish.set_fen_position(self.board.fen())
-                evaluation = self.stockfish.get_evaluation()
+                self.stockfish.resync()
             except Exception as e:
-                print("Error evaluating position:", e)
-                return 0.0
-            if evaluation["type"] == "cp":
-                raw_score = evaluation["value"] / 100.0
-            elif evaluation["type"] == "mate":
-                raw_score = 5.0 if evaluation["value"] > 0 else -5.0
-            else:
-                raw_score = 0.0
-            return max(-5.0, min(5.0, raw_score))
+                print("Error resyncing Stockfish:", e)
+            return None, None
+        if evaluation is None:
+            return best_uci, None
+        if evaluation["type"] == "cp":
+            raw_score = evaluation["value"] / 100.0
+        elif evaluation["type"] == "mate":
+            raw_score = 5.0 if evaluation["value"] > 0 else -5.0
+        else:
+            raw_score = 0.0
+        # The engine scores from the side to move's view.
+        if fen.split()[1] == "b":
+            raw_score = -raw_score + 0.0  # + 0.0 turns a level -0.0 back into 0.0.
+        return best_uci, max(-5.0, min(5.0, raw_score))
+
+    def request_evaluation(self):
+        """Update the score from the cache, or queue an engine evaluation of the current position."""
+        if not self.stockfish:
+            self.current_score = 0.0
+            return
+        h = self._current_key()
+        if h in self._eval_cache:
+            self.current_score = self._eval_cache[h]
         else:
-            return 0.0
+            self._engine_jobs.put(("eval", self._current_fen(), h, self.EVAL_DEPTH, self._board_generation))
+
+    def on_evaluation_ready(self, key: int, score):
+        """Store a finished evaluation and show it if the board is still in that position."""
+        if score is not None:
+            self.cache_evaluation(key, score)
+        if key == self._current_key():
+            self.current_score = 0.0 if score is None else score
+
+    def cache_evaluation(self, h: int, score: float):
+        """Store a clamped score in the evaluation cache, evicting the oldest entry when full."""
+        if h not in self._eval_cache:
+            self._eval_cache_keys.append(h)
+            if len(self._eval_cache_keys) > self.EVAL_CACHE_SIZE:
+                del self._eval_cache[self._eval_cache_keys.popleft()]
+        self._eval_cache[h] = score
 
-    def highlight_square(self, square: int, color, width=3):
-        """Highlight the given board square (0-63) with a colored rectangle outline."""
-        col = square % 8
-        row = 7 - (square // 8)
-        rect = pygame.Rect(col * self.SQUARE_SIZE, row * self.SQUARE_SIZE,
-                           self.SQUARE_SIZE, self.SQUARE_SIZE)
-        pygame.draw.rect(self.screen, color, rect, width)
+    def highlight_square(self, square: int, color):
+        """Highlight the given board square (0-63) with a pre-rendered colored outline."""
+        self.screen.blit(self._hl_surf[color], self._sq_xy[square])
 
-    def schedule_ai_move(self, delay_ms=3000):
+    def _legal_set(self):
+        """Return the legal moves of the current position, regenerating them only after the board changed."""
+        if self._legal_cache[0] != self._board_generation:
+            self._legal_cache = (self._board_generation, frozenset(self.board.legal_moves))
+        return self._legal_cache[1]
+
+    def _current_key(self) -> int:
+        """Return the Zobrist hash of the current position, recomputing it only after the board changed."""
+        if self._key_cache[0] != self._board_generation:
+            self._key_cache = (self._board_generation, chess.polyglot.zobrist_hash(self.board))
+        return self._key_cache[1]
+
+    def _current_fen(self) -> str:
+        """Return the FEN of the current position, rebuilding it only after the board changed."""
+        if self._fen_cache[0] != self._board_generation:
+            self._fen_cache = (self._board_generation, self.board.fen())
+        return self._fen_cache[1]
+
+    def request_ai_move(self) -> bool:
         """
-        Schedule the AI move by setting a timer event.
-        This avoids using a blocking sleep call.
+        Play a book move if the opening book has one for this position,
+        otherwise queue a best-move search on the engine worker.
+        Returns True if a search was queued; it will report the position's evaluation too.
         """
-        pygame.time.set_timer(AI_MOVE_EVENT, delay_ms)
-        self.ai_move_scheduled = True
-
-    def ai_move(self):
-        """Let the AI (Stockfish) determine and play its move."""
-        if self.stockfish:
+        if self._book:
             try:
-                self.stockfish.set_fen_position(self.board.fen())
-                best_uci = self.stockfish.get_best_move()
-            except Exception as e:
-                print("Error getting AI move:", e)
-                best_uci = None
-            if best_uci:
-                move = chess.Move.from_uci(best_uci)
-                if move in self.board.legal_moves:
-                    self.board.push(move)
-                    self.last_ai_move = move
+                entry = self._book.weighted_choice(self.board)
+            except IndexError:
+                entry = None
+            if entry:
+                key = self._current_key()
+                pygame.event.post(pygame.event.Event(AI_READY_EVENT, key=key, move=entry.move.uci()))
+                return False
+        if self.stockfish:
+            self._engine_jobs.put(
+                ("bestmove", self._current_fen(), self._current_key(), self.AI_DEPTH, self._board_generation)
+            )
+            return True
+        return False
 
-    def draw_chessboard(self):
-        """Draw the chess board squares, highlight selected and AI move squares, and draw all pieces."""
-        # Draw board squares.
-        for row in range(8):
-            for col in range(8):
-                square_color = self.WHITE if (row + col) % 2 == 0 else self.GRAY
-                pygame.draw.rect(
-                    self.screen,
-                    square_color,
-                    (col * self.SQUARE_SIZE, row * self.SQUARE_SIZE,
-                     self.SQUARE_SIZE, self.SQUARE_SIZE)
-                )
+    def ai_move(self, key: int, best_uci):
+        """
+        Play the AI's move once the worker has found it.
+        Results for a position the board has since left (undo, reset) are dropped.
+        """
+        if best_uci and key == self._current_key():
+            move = chess.Move.from_uci(best_uci)
+            if move in self._legal_set():
+                self.board.push(move)
+                self._board_generation += 1
+                self.last_ai_move = move
+                self._needs_redraw = True
+                self.request_evaluation()
 
-        # Highlight the user's selected square.
+    def draw_chessboard(self):
+        """
+        Redraw the board squares whose piece or highlight changed since the last draw
+        (or the whole board if nothing has been drawn yet) and mark them dirty.
+        """
+        # Highlight the user's selected square and the AI's last move.
+        highlights = {}
         if self.selected_square is not None:
-            self.highlight_square(self.selected_square, self.YELLOW, width=3)
-
-        # Highlight the AI's last move.
+            highlights[self.selected_square] = self.YELLOW
         if self.last_ai_move is not None:
-            self.highlight_square(self.last_ai_move.from_square, self.ORANGE, width=3)
-            self.highlight_square(self.last_ai_move.to_square, self.ORANGE, width=3)
+            highlights[self.last_ai_move.from_square] = self.ORANGE
+            highlights[self.last_ai_move.to_square] = self.ORANGE
 
-        # Draw pieces on the board.
-        for sq in chess.SQUARES:
-            piece = self.board.piece_at(sq)
+        pieces = self.board.piece_map()
+        board_state = {sq: (pieces.get(sq), highlights.get(sq)) for sq in pieces.keys() | highlights.keys()}
+
+        # Draw board squares.
+        if self._drawn_board is None:
+            self.screen.blit(self._board_bg, (0, 0))
+            self._dirty.append(pygame.Rect(0, 0, self.BOARD_SIZE, self.BOARD_SIZE))
+            changed = board_state.keys()
+        else:
+            drawn = self._drawn_board
+            changed = [sq for sq in drawn.keys() | board_state.keys() if drawn.get(sq) != board_state.get(sq)]
+            for sq in changed:
+                self.screen.blit(self._board_bg, self._sq_xy[sq], self._sq_rect[sq])
+                self._dirty.append(self._sq_rect[sq])
+
+        # Draw highlights and pieces on the changed squares.
+        for sq in changed:
+            piece, color = board_state.get(sq, (None, None))
+            if color:
+                self.highlight_square(sq, color)
             if piece:
-                col = sq % 8
-                row = 7 - (sq // 8)
                 image = self.get_piece_image(piece)
                 if image:
-                    self.screen.blit(image, (col * self.SQUARE_SIZE, row * self.SQUARE_SIZE))
+                    self.screen.blit(image, self._sq_xy[sq])
+        self._drawn_board = board_state
 
     def draw_evaluation_bar(self, score: float):
-        """Draw the evaluation bar on the right side along with numeric labels."""
-        bar_x = self.BOARD_SIZE
-        pygame.draw.rect(self.screen, self.BLACK, (bar_x, 0, self.BAR_WIDTH, self.HEIGHT))
+        """Draw the evaluation bar on the right side, reusing a cached bar for the same displayed score."""
+        key = round(score, 1) + 0.0  # -0.0 and 0.0 are one dict key; always draw it as +0.0.
+        bar_surf = self._bar_cache.get(key)
+        if bar_surf is None:
+            if len(self._bar_cache) > 101:
+                self._bar_cache.clear()
+            bar_surf = self.render_evaluation_bar(key)
+            self._bar_cache[key] = bar_surf
+        self.screen.blit(bar_surf, (self.BOARD_SIZE, 0))
+
+    def render_evaluation_bar(self, score: float):
+        """Render the evaluation bar along with its labels and numeric score onto a new surface."""
+        bar_surf = pygame.Surface((self.BAR_WIDTH, self.HEIGHT)).convert()
+        bar_surf.fill(self.BLACK)
         normalized = (score + 5.0) / 10.0  # Normalize score from [-5,5] to [0,1]
         bar_height = int(normalized * self.HEIGHT)
         bar_color = self.GREEN if score >= 0 else self.RED
         bar_y = self.HEIGHT - bar_height
-        pygame.draw.rect(self.screen, bar_color, (bar_x + 10, bar_y, self.BAR_WIDTH - 20, bar_height))
+        pygame.draw.rect(bar_surf, bar_color, (10, bar_y, self.BAR_WIDTH - 20, bar_height))
 
         # Draw labels.
-        white_label = self.font.render("White", True, self.WHITE)
-        black_label = self.font.render("Black", True, self.WHITE)
-        self.screen.blit(white_label, (bar_x + 5, 5))
-        self.screen.blit(black_label, (bar_x + 5, self.HEIGHT - 25))
+        bar_surf.blit(self._white_label, (5, 5))
+        bar_surf.blit(self._black_label, (5, self.HEIGHT - 25))
 
         # Draw numeric evaluation.
         score_text = f"{score:+.1f}"
         eval_surf = self.font.render(score_text, True, self.WHITE)
-        text_x = bar_x + (self.BAR_WIDTH // 2) - (eval_surf.get_width() // 2)
+        text_x = (self.BAR_WIDTH // 2) - (eval_surf.get_width() // 2)
         text_y = (self.HEIGHT // 2) - (eval_surf.get_height() // 2)
-        self.screen.blit(eval_surf, (text_x, text_y))
+        bar_surf.blit(eval_surf, (text_x, text_y))
+        return bar_surf
 
     def update_display(self):
-        """Redraw the board, evaluation bar, and, if the game is over, a game over message."""
-        self.screen.fill(self.BLACK)
-        self.draw_chessboard()
-        self.draw_evaluation_bar(self.current_score)
-        if self.board.is_game_over():
-            result_text = f"Game Over! Result: {self.board.result()}"
-            text_surf = self.font.render(result_text, True, self.WHITE)
-            self.screen.blit(text_surf, (10, self.BOARD_SIZE + 10))
-        pygame.display.flip()
-        pygame.event.pump()
+        """
+        Redraw the board (and game over message) if the position or highlights changed,
+        and the evaluation bar if the score changed, then update only those areas.
+        """
+        if self._full_update:
+            self.screen.fill(self.BLACK)
+        if self._needs_redraw:
+            self.draw_chessboard()
+            status_rect = pygame.Rect(0, self.BOARD_SIZE, self.BOARD_SIZE, self.HEIGHT - self.BOARD_SIZE)
+            self.screen.fill(self.BLACK, status_rect)
+            self._dirty.append(status_rect)
+            if self.board.is_game_over():
+                if self._game_over_surf is None:
+                    result_text = f"Game Over! Result: {self.board.result()}"
+                    self._game_over_surf = self.font.render(result_text, True, self.WHITE)
+                self._dirty.append(self.screen.blit(self._game_over_surf, (10, self.BOARD_SIZE + 10)))
+            self._needs_redraw = False
+        if self.current_score != self._last_drawn_score:
+            self.draw_evaluation_bar(self.current_score)
+            self._dirty.append(pygame.Rect(self.BOARD_SIZE, 0, self.BAR_WIDTH, self.HEIGHT))
+            self._last_drawn_score = self.current_score
+        if self._full_update:
+            # The first frame (and any full repaint) also has to present the
+            # area right of the evaluation bar, which is never redrawn.
+            pygame.display.flip()
+            self._full_update = False
+        elif self._dirty:
+            pygame.display.update(self._dirty)
+        self._dirty.clear()
 
     def run(self):
         """Main loop of the game."""
         running = True
-        clock = pygame.time.Clock()
-        self.current_score = self.get_evaluation_score()
+        self.request_evaluation()
 
         while running:
-            for event in pygame.event.get():
+            # Block until something happens (input or an engine result) instead of
+            # polling, then handle everything that is queued.
+            events = [pygame.event.wait()] + pygame.event.get()
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
 
@@ -224,49 +475,64 @@ class ChessGame:
                             piece = self.board.piece_at(square_clicked)
                             if piece and piece.color == self.board.turn:
                                 self.selected_square = square_clicked
+                                self._needs_redraw = True
                         else:
                             # Second click: attempt to make a move.
                             move = chess.Move(from_square=self.selected_square, to_square=square_clicked)
-                            if move in self.board.legal_moves:
+                            if move in self._legal_set():
                                 self.board.push(move)
+                                self._board_generation += 1
                                 self.selected_square = None
-                                self.current_score = self.get_evaluation_score()
-                                self.update_display()
-                                # Schedule the AI move if the game isn't over.
-                                if not self.board.is_game_over():
-                                    self.schedule_ai_move(delay_ms=3000)
+                                self._needs_redraw = True
+                                # Ask the engine for its reply if the game isn't over. Its search
+                                # also scores this position, so a separate evaluation is only
+                                # needed when no search was queued.
+                                if self.board.is_game_over() or not self.request_ai_move():
+                                    self.request_evaluation()
                             else:
                                 # Invalid move feedback.
                                 print("Invalid move attempted.")
                                 self.selected_square = None
+                                self._needs_redraw = True
 
                 elif event.type == pygame.KEYDOWN:
                     # Press 'U' to undo a move.
                     if event.key == pygame.K_u:
                         if len(self.board.move_stack) >= 1:
                             self.board.pop()
-                            self.current_score = self.get_evaluation_score()
-                            self.update_display()
+                            self._board_generation += 1
+                            self._game_over_surf = None
+                            self._needs_redraw = True
+                            self.request_evaluation()
                     # Press 'R' to restart the game.
                     elif event.key == pygame.K_r:
                         self.board.reset()
+                        self._board_generation += 1
+                        self._game_over_surf = None
                         self.selected_square = None
                         self.last_ai_move = None
-                        self.current_score = self.get_evaluation_score()
-                        self.update_display()
+                        self._needs_redraw = True
+                        self.request_evaluation()
+
+                elif event.type == pygame.VIDEOEXPOSE:
+                    # The window was uncovered; repaint and present everything.
+                    self._needs_redraw = True
+                    self._drawn_board = None
+                    self._last_drawn_score = None
+                    self._full_update = True
+
+                elif event.type == EVAL_READY_EVENT:
+                    self.on_evaluation_ready(event.key, event.score)
 
-                elif event.type == AI_MOVE_EVENT:
-                    # Cancel the timer event.
-                    pygame.time.set_timer(AI_MOVE_EVENT, 0)
-                    self.ai_move_scheduled = False
+                elif event.type == AI_READY_EVENT:
                     if not self.board.is_game_over():
-                        self.ai_move()
-                        self.current_score = self.get_evaluation_score()
-                        self.update_display()
+                        self.ai_move(event.key, event.move)
 
             self.update_display()
-            clock.tick(30)
 
+        self._engine_jobs.put(None)
+        if self._book:
+            self._book.close()
         pygame.quit()
 
 if __name__ == "__main__":